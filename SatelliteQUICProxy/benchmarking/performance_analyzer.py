@@ -10,19 +10,34 @@ import os
 import sys
 import time
 import json
+import math
 import signal
 import socket
+import struct
 import argparse
+import asyncio
 import logging
-import subprocess
 import threading
 import tempfile
 import datetime
 import csv
 import random
-import statistics
+import itertools
+import queue
+import select
+import fcntl
+import termios
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+try:
+    # Optional C helper, built with: python setup.py build_ext --inplace
+    from _fast_io import fast_sendfile
+except ImportError:
+    fast_sendfile = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -30,26 +45,273 @@ logging.basicConfig(
 )
 logger = logging.getLogger('perf_analyzer')
 
+# Columns of the results CSV, in order
+RESULT_FIELDS = (
+    'test_id',
+    'timestamp',
+    'file_size_kb',
+    'duration_sec',
+    'throughput_kbps',
+    'proxy_enabled',
+    'fpga_enabled',
+    'success',
+    'error',
+    'rtt_us',
+    'retrans',
+    'bytes_acked',
+    'snd_cwnd'
+)
+
+# Result timestamps are kept as epoch seconds and only formatted for the CSV
+TIMESTAMP_COLUMN = RESULT_FIELDS.index('timestamp')
+
+# Test configurations - we'll test 3 modes:
+# 1. Direct connection (no proxy)
+# 2. Proxy without FPGA acceleration
+# 3. Proxy with FPGA acceleration
+TEST_CONFIGS = (
+    {"proxy": False, "fpga": False},
+    {"proxy": True, "fpga": False},
+    {"proxy": True, "fpga": True}
+)
+
+# Layout of the per-configuration aggregates built by analyze_results
+AGG_COUNT, AGG_SUM_T, AGG_SUM_T2, AGG_MIN_T, AGG_MAX_T, AGG_SUM_D, AGG_SUM_D2 = range(7)
+
+# Links slower than this are limited by the simulator's netem rate, so the
+# sender only needs to keep the socket full rather than ship real test data
+RATE_LIMIT_THRESHOLD_KBPS = 100000
+
+# Read-only zero buffer sent on rate-limited links, shared by forked workers
+_ZERO_PAGE = bytes(1 << 20)
+
+# Maximum number of bytes moved per splice(2) call
+SPLICE_CHUNK_SIZE = 1 << 20
+
+# Linux reports the bytes still in a socket's send queue, i.e. not yet
+# acknowledged by the peer, with SIOCOUTQ (the same request as TIOCOUTQ)
+SIOCOUTQ = termios.TIOCOUTQ if sys.platform.startswith('linux') else None
+
+# Bounds on the send queue poll interval while waiting for the peer's ACKs;
+# in between, the interval is a fraction of the connection's smoothed RTT
+DELIVERY_POLL_MIN_SEC = 0.0002
+DELIVERY_POLL_MAX_SEC = 0.05
+
+# Leading part of Linux's struct tcp_info, up to bytes_received: eight u8
+# fields, 24 u32 fields (tcpi_rto .. tcpi_total_retrans), then four u64
+TCP_INFO = getattr(socket, 'TCP_INFO', None)
+TCP_INFO_STRUCT = struct.Struct('8B24I4Q')
+TCPI_RTT, TCPI_SND_CWND, TCPI_TOTAL_RETRANS, TCPI_BYTES_ACKED = 23, 26, 31, 34
+
+def _new_aggregate():
+    """Return an empty per-configuration aggregate (see AGG_* for the layout)"""
+    return array('d', (0.0, 0.0, 0.0, math.inf, -math.inf, 0.0, 0.0))
+
+def _sample_stdev(count, total, total_sq):
+    """Sample standard deviation from a count, sum and sum of squares"""
+    return math.sqrt(max(total_sq - total * total / count, 0.0) / (count - 1))
+
+def _tcp_info(sock):
+    """
+    Read the kernel's counters for a TCP connection
+    
+    Args:
+        sock: Connected TCP socket
+    
+    Returns:
+        tuple: (rtt_us, total_retrans, bytes_acked, snd_cwnd), or None if
+        TCP_INFO is unsupported or the kernel's struct tcp_info is too old
+    """
+    if TCP_INFO is None:
+        return None
+    
+    try:
+        raw = sock.getsockopt(socket.IPPROTO_TCP, TCP_INFO, TCP_INFO_STRUCT.size)
+    except OSError:
+        return None
+    if len(raw) < TCP_INFO_STRUCT.size:
+        return None
+    
+    info = TCP_INFO_STRUCT.unpack(raw)
+    return (info[TCPI_RTT], info[TCPI_TOTAL_RETRANS],
+            info[TCPI_BYTES_ACKED], info[TCPI_SND_CWND])
+
+def _sendfile(sock, fileobj, count):
+    """
+    Send count bytes of a file on a socket with sendfile(2)
+    
+    Uses the _fast_io extension when it is built, which loops in C with the
+    GIL released for the whole transfer, and socket.sendfile otherwise.
+    
+    Args:
+        sock: Connected socket
+        fileobj: File opened in binary mode, sent from its current position
+        count: Number of bytes to send
+    
+    Returns:
+        int: Number of bytes sent
+    """
+    if fast_sendfile is None:
+        return sock.sendfile(fileobj, count=count)
+    
+    timeout = sock.gettimeout()
+    return fast_sendfile(sock.fileno(), fileobj.fileno(), count, fileobj.tell(),
+                         -1.0 if timeout is None else timeout)
+
+def _splice_forward(src_fd, dst_fd, nbytes, timeout=None, pipe=None):
+    """
+    Forward data between two file descriptors with splice(2)
+    
+    Data moves src_fd -> pipe -> dst_fd entirely inside the kernel, so it
+    is never copied through user space.
+    
+    Args:
+        src_fd: File descriptor to read from
+        dst_fd: File descriptor to write to (may be a non-blocking socket)
+        nbytes: Number of bytes to forward
+        timeout: Seconds to wait for dst_fd to become writable
+        pipe: Empty (read_fd, write_fd) pipe to reuse; a temporary pipe is
+            created and closed if not given
+    
+    Returns:
+        int: Number of bytes forwarded (less than nbytes if src_fd hit EOF)
+    """
+    pipe_r, pipe_w = pipe if pipe is not None else os.pipe()
+    
+    try:
+        remaining = nbytes
+        while remaining > 0:
+            n = os.splice(src_fd, pipe_w, min(remaining, SPLICE_CHUNK_SIZE),
+                          flags=os.SPLICE_F_MOVE)
+            if n == 0:
+                break
+            remaining -= n
+            
+            # Hint that more data follows on all but the last chunk; a
+            # flagged tail is held back until the kernel's cork timer fires
+            flags = os.SPLICE_F_MOVE | (os.SPLICE_F_MORE if remaining > 0 else 0)
+            
+            # Drain the pipe into the destination
+            while n > 0:
+                try:
+                    n -= os.splice(pipe_r, dst_fd, n, flags=flags)
+                except BlockingIOError:
+                    _, writable, _ = select.select([], [dst_fd], [], timeout)
+                    if not writable:
+                        raise socket.timeout("timed out")
+        
+        return nbytes - remaining
+    finally:
+        if pipe is None:
+            os.close(pipe_r)
+            os.close(pipe_w)
+
+# Per-process test instance used by worker processes
+_worker_test = None
+
+def _init_worker(config_path, output_dir, payload_path, link_shaped):
+    """Create the transfer-only test instance for a worker process"""
+    global _worker_test
+    _worker_test = PerformanceTest(config_path, output_dir, worker=True,
+                                   link_shaped=link_shaped)
+    _worker_test.payload_path = payload_path
+    _worker_test.prepare_connections(1)
+
+def _run_one(size_kb, test_config, test_id):
+    """Run a single transfer test inside a worker process"""
+    return _worker_test.run_transfer_test(
+        size_kb,
+        proxy_enabled=test_config["proxy"],
+        fpga_enabled=test_config["fpga"],
+        test_id=test_id
+    )
+
+def _terminate_pool(executor):
+    """
+    Shut a process pool down without waiting for in-flight transfers
+    
+    Queued tests are cancelled and the worker processes are terminated,
+    since a running transfer can take up to the socket timeout.
+    """
+    if hasattr(executor, 'terminate_workers'):
+        executor.terminate_workers()
+        return
+    
+    # Grab the workers before shutdown() drops its reference to them
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
 class PerformanceTest:
     """Base class for performance tests"""
     
-    def __init__(self, config_path, output_dir):
+    def __init__(self, config_path, output_dir, worker=False, link_shaped=False):
         """
         Initialize the performance test
         
         Args:
             config_path: Path to the JSON configuration file
             output_dir: Directory to store results
+            worker: Whether this instance only runs transfers inside a
+                worker process on behalf of the main test
+            link_shaped: Whether the simulator's netem qdisc is actually
+                shaping the link under test
         """
         self.config_path = config_path
         self.output_dir = Path(output_dir)
         self.load_config()
+        # Results are stored by index; run_tests preallocates the list for
+        # the expected number of tests
         self.results = []
+        self.results_count = 0
         self.running = False
         
+        # Idle connections kept open between tests, keyed by (address, port)
+        self._conn_pool = defaultdict(queue.Queue)
+        
+        # Pipe reused by every splice transfer, created on first use
+        self._splice_pipe = None
+        
+        # Single test data file; each test sends a prefix of it
+        self.payload_path = None
+        self._payload_file = None
+        
+        # On a netem rate-limited link the payload content does not affect the
+        # measured throughput, so zeros are sent without any test data file
+        # (unless random data was explicitly requested). The configured rate
+        # only applies while the simulator's qdisc is in place.
+        self.link_shaped = link_shaped
+        bandwidth_kbps = self.config.get('link', {}).get('bandwidth_kbps')
+        random_payload = self.config['test_settings'].get('random_payload', False)
+        self._is_rate_limited = (link_shaped
+                                 and bandwidth_kbps is not None
+                                 and bandwidth_kbps < RATE_LIMIT_THRESHOLD_KBPS
+                                 and not random_payload)
+        
+        # Wall-clock anchor for result timestamps, which are then derived from
+        # the monotonic clock, and a counter for test IDs
+        self._epoch = time.time()
+        self._monotonic_start = time.monotonic()
+        self._test_counter = itertools.count()
+        
+        if worker:
+            # Shutdown is coordinated by the main process
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            return
+        
         # Create output directory if it doesn't exist
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
+        # Results are streamed to CSV as each test completes
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._csv_path = self.output_dir / f"performance_results_{timestamp}.csv"
+        self._csv_fh = open(self._csv_path, 'w', newline='')
+        self._csv_writer = csv.writer(self._csv_fh)
+        self._csv_writer.writerow(RESULT_FIELDS)
+        self._csv_fh.flush()
+        
         # Register signal handlers
         signal.signal(signal.SIGINT, self.handle_signal)
         signal.signal(signal.SIGTERM, self.handle_signal)
@@ -64,22 +326,45 @@ class PerformanceTest:
             logger.error(f"Failed to load configuration: {e}")
             sys.exit(1)
     
-    def prepare_test_data(self, size_kb):
-        """Prepare test data of the specified size"""
+    def prepare_test_data(self, size_kb, random_payload=False):
+        """
+        Prepare test data of the specified size
+        
+        Args:
+            size_kb: Size of the test data in KB
+            random_payload: Fill the file with random bytes instead of zeros,
+                e.g. for tests that must defeat compression
+        
+        Returns:
+            str: Path to the test data file, or None on failure
+        """
         size_bytes = size_kb * 1024
         data_file = tempfile.NamedTemporaryFile(delete=False)
+        data_file.close()
         
         try:
-            # Generate random data
-            with open(data_file.name, 'wb') as f:
-                # We'll write in chunks to avoid memory issues with large files
-                chunk_size = 10 * 1024 * 1024  # 10MB chunks
-                remaining = size_bytes
-                
-                while remaining > 0:
-                    write_size = min(chunk_size, remaining)
-                    f.write(os.urandom(write_size))
-                    remaining -= write_size
+            if random_payload:
+                # Generate random data
+                with open(data_file.name, 'wb') as f:
+                    # We'll write in chunks to avoid memory issues with large files
+                    chunk_size = 10 * 1024 * 1024  # 10MB chunks
+                    remaining = size_bytes
+                    
+                    while remaining > 0:
+                        write_size = min(chunk_size, remaining)
+                        f.write(os.urandom(write_size))
+                        remaining -= write_size
+            else:
+                # Zero-filled payloads are common in QUIC benchmarks and only
+                # need the blocks allocated, not written byte by byte
+                fd = os.open(data_file.name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                try:
+                    if hasattr(os, 'posix_fallocate'):
+                        os.posix_fallocate(fd, 0, size_bytes)
+                    else:
+                        os.ftruncate(fd, size_bytes)
+                finally:
+                    os.close(fd)
             
             logger.info(f"Created test data file: {data_file.name} ({size_kb} KB)")
             return data_file.name
@@ -88,14 +373,137 @@ class PerformanceTest:
             os.unlink(data_file.name)
             return None
     
-    def run_transfer_test(self, data_file, proxy_enabled=True, fpga_enabled=True):
+    def prepare_connections(self, count):
+        """Pre-open connections to the proxy and the target"""
+        endpoints = [
+            (self.config['proxy_settings']['proxy_address'],
+             self.config['proxy_settings']['proxy_port']),
+            (self.config['proxy_settings']['target_address'],
+             self.config['proxy_settings']['target_port'])
+        ]
+        
+        for key in endpoints:
+            for _ in range(count):
+                try:
+                    self._conn_pool[key].put(self._open_connection(key))
+                except OSError as e:
+                    logger.warning(f"Failed to pre-open connection to {key[0]}:{key[1]}: {e}")
+                    break
+    
+    def _open_connection(self, key):
+        """Open a new connection to the given (address, port)"""
+        sock = socket.create_connection(key, timeout=300)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+    
+    def _get_connection(self, key):
+        """Take an idle connection from the pool, opening one if none is left"""
+        try:
+            return self._conn_pool[key].get_nowait()
+        except queue.Empty:
+            return self._open_connection(key)
+    
+    def _release_connection(self, key, sock):
+        """Return a connection to the pool unless the peer has closed it"""
+        # A connection the peer has shut down polls readable with no data
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            closed = bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+        except OSError:
+            closed = True
+        
+        if closed:
+            sock.close()
+        else:
+            self._conn_pool[key].put(sock)
+    
+    def _wait_delivered(self, sock):
+        """
+        Wait until the peer has acknowledged all data sent on a connection
+        
+        Polls the kernel send queue, which only drains once the data is
+        ACKed, so the connection stays open for reuse. Polls run a few times
+        per round trip. Where SIOCOUTQ is not available, half-closes the
+        connection and waits for the peer's EOF.
+        
+        Args:
+            sock: Connected socket with the transfer already sent
+        
+        Returns:
+            bool: Whether the connection can be returned to the pool
+        
+        Raises:
+            socket.timeout: If the data is not acknowledged within the
+                socket timeout
+            OSError: If the connection fails (e.g. is reset) while waiting
+        """
+        if SIOCOUTQ is None:
+            # Signal end of data and wait for the peer to close its side
+            sock.shutdown(socket.SHUT_WR)
+            while sock.recv(65536):
+                pass
+            return False
+        
+        timeout = sock.gettimeout()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        outq = array('i', [0])
+        
+        while True:
+            # A reset connection never drains its send queue
+            err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err:
+                raise OSError(err, os.strerror(err))
+            
+            fcntl.ioctl(sock.fileno(), SIOCOUTQ, outq)
+            if outq[0] == 0:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                raise socket.timeout("timed out waiting for the peer to acknowledge data")
+            
+            info = _tcp_info(sock)
+            interval = info[0] / 16e6 if info else DELIVERY_POLL_MAX_SEC
+            time.sleep(min(max(interval, DELIVERY_POLL_MIN_SEC), DELIVERY_POLL_MAX_SEC))
+    
+    def next_test_id(self):
+        """Return a unique ID for the next test"""
+        return f"test_{next(self._test_counter):08d}"
+    
+    def _timestamp(self):
+        """Return the current wall-clock time as seconds since the epoch"""
+        return self._epoch + (time.monotonic() - self._monotonic_start)
+    
+    def _payload(self):
+        """Return the test data file, opened once and kept open for reuse"""
+        if self._payload_file is None:
+            self._payload_file = open(self.payload_path, 'rb')
+        return self._payload_file
+    
+    def send_payload(self, sock, file_size):
+        """Send the first file_size bytes of the test data with sendfile(2)"""
+        f = self._payload()
+        f.seek(0)
+        _sendfile(sock, f, file_size)
+    
+    def send_zeros(self, sock, file_size):
+        """Send file_size zero bytes from the shared zero buffer"""
+        zeros = memoryview(_ZERO_PAGE)
+        more = getattr(socket, 'MSG_MORE', 0)
+        remaining = file_size
+        
+        while remaining > 0:
+            # Hint that more data follows on all but the last chunk
+            flags = more if remaining > len(zeros) else 0
+            remaining -= sock.send(zeros[:remaining], flags)
+    
+    def run_transfer_test(self, size_kb, proxy_enabled=True, fpga_enabled=True, test_id=None):
         """
         Run a data transfer test through the proxy
         
         Args:
-            data_file: Path to the file containing test data
+            size_kb: Amount of test data to send in KB
             proxy_enabled: Whether to route through the proxy
             fpga_enabled: Whether FPGA acceleration is enabled
+            test_id: ID to record for this test (generated if not given)
         
         Returns:
             dict: Test results
@@ -105,156 +513,254 @@ class PerformanceTest:
         target_addr = self.config['proxy_settings']['target_address']
         target_port = self.config['proxy_settings']['target_port']
         
-        # Get file size
-        file_size = os.path.getsize(data_file)
+        # Get transfer size
+        file_size = size_kb * 1024
         file_size_kb = file_size / 1024
         
         # Create a unique ID for this test
-        test_id = f"test_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{random.randint(1000, 9999)}"
+        if test_id is None:
+            test_id = self.next_test_id()
         
-        # Command for client and server components
-        # In a real test, we'd have separate client and server programs
-        # For this simulation, we'll use a dummy command to simulate the transfer
+        if proxy_enabled:
+            # Transfer through the proxy
+            addr, port = proxy_addr, proxy_port
+        else:
+            # Direct transfer to the target
+            addr, port = target_addr, target_port
         
-        start_time = time.time()
+        start_time = time.monotonic()
         
         try:
-            if proxy_enabled:
-                # Simulate transfer through proxy
-                cmd = [
-                    "bash", "-c",
-                    f"cat {data_file} | "
-                    f"nc {proxy_addr} {proxy_port} > /dev/null"
-                ]
+            logger.info(f"Starting transfer test: {size_kb} KB -> {addr}:{port}")
+            
+            # Reuse a pooled connection where possible so the test does not
+            # pay for a TCP handshake over the satellite link
+            key = (addr, port)
+            sock = self._get_connection(key)
+            
+            # Kernel counters are cumulative per connection, so snapshot them
+            # to attribute retransmits and acked bytes to this transfer only
+            tcp_before = _tcp_info(sock)
+            
+            try:
+                if self._is_rate_limited:
+                    self.send_zeros(sock, file_size)
+                elif proxy_enabled:
+                    self._run_transfer_python(sock, file_size)
+                else:
+                    # Stream the file straight from the page cache into the
+                    # socket with sendfile(2)
+                    self.send_payload(sock, file_size)
+                
+                # Stop the clock only once the payload has been delivered,
+                # not when it was handed to the kernel's send buffer
+                reusable = self._wait_delivered(sock)
+                
+                # Sample the counters once everything has been acknowledged so
+                # they describe the whole transfer
+                tcp_after = _tcp_info(sock)
+            except BaseException:
+                sock.close()
+                raise
+            
+            if reusable:
+                self._release_connection(key, sock)
             else:
-                # Simulate direct transfer
-                cmd = [
-                    "bash", "-c",
-                    f"cat {data_file} | "
-                    f"nc {target_addr} {target_port} > /dev/null"
-                ]
-            
-            # Run the command and capture output
-            logger.info(f"Starting transfer test: {' '.join(cmd)}")
-            process = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-            
-            end_time = time.time()
+                sock.close()
+            
+            end_time = time.monotonic()
             duration = end_time - start_time
             
             # Calculate throughput
             throughput_kbps = (file_size_kb * 8) / duration if duration > 0 else 0
             
+            # Kernel-measured RTT, retransmits and congestion window
+            if tcp_before and tcp_after:
+                rtt_us, retrans, bytes_acked, snd_cwnd = tcp_after
+                retrans -= tcp_before[1]
+                bytes_acked -= tcp_before[2]
+            else:
+                rtt_us = retrans = bytes_acked = snd_cwnd = None
+            
             # Create result dictionary
             result = {
                 'test_id': test_id,
-                'timestamp': datetime.datetime.now().isoformat(),
+                'timestamp': self._timestamp(),
                 'file_size_kb': file_size_kb,
                 'duration_sec': duration,
                 'throughput_kbps': throughput_kbps,
                 'proxy_enabled': proxy_enabled,
                 'fpga_enabled': fpga_enabled,
-                'success': process.returncode == 0,
-                'error': None
+                'success': True,
+                'error': None,
+                'rtt_us': rtt_us,
+                'retrans': retrans,
+                'bytes_acked': bytes_acked,
+                'snd_cwnd': snd_cwnd
             }
             
-            if process.returncode != 0:
-                result['error'] = f"Command failed: {process.stderr}"
-                logger.error(f"Test failed: {process.stderr}")
-            
             logger.info(f"Test completed: {result['success']}, "
                       f"Duration: {duration:.2f}s, "
-                      f"Throughput: {throughput_kbps:.2f} kbps")
+                      f"Throughput: {throughput_kbps:.2f} kbps, "
+                      f"RTT: {rtt_us} us, Retransmits: {retrans}")
             
             return result
             
-        except subprocess.TimeoutExpired:
-            end_time = time.time()
+        except socket.timeout:
+            end_time = time.monotonic()
             duration = end_time - start_time
             
             logger.error(f"Test timed out after {duration:.2f} seconds")
             
             return {
                 'test_id': test_id,
-                'timestamp': datetime.datetime.now().isoformat(),
+                'timestamp': self._timestamp(),
                 'file_size_kb': file_size_kb,
                 'duration_sec': duration,
                 'throughput_kbps': 0,
                 'proxy_enabled': proxy_enabled,
                 'fpga_enabled': fpga_enabled,
                 'success': False,
-                'error': "Timeout"
+                'error': "Timeout",
+                'rtt_us': None,
+                'retrans': None,
+                'bytes_acked': None,
+                'snd_cwnd': None
             }
             
-        except Exception as e:
-            end_time = time.time()
+        except OSError as e:
+            end_time = time.monotonic()
             duration = end_time - start_time
             
             logger.error(f"Test failed: {e}")
             
             return {
                 'test_id': test_id,
-                'timestamp': datetime.datetime.now().isoformat(),
+                'timestamp': self._timestamp(),
                 'file_size_kb': file_size_kb,
                 'duration_sec': duration,
                 'throughput_kbps': 0,
                 'proxy_enabled': proxy_enabled,
                 'fpga_enabled': fpga_enabled,
                 'success': False,
-                'error': str(e)
+                'error': str(e),
+                'rtt_us': None,
+                'retrans': None,
+                'bytes_acked': None,
+                'snd_cwnd': None
             }
     
-    def save_results(self):
-        """Save test results to a CSV file"""
-        if not self.results:
-            logger.warning("No results to save")
+    def _run_transfer_python(self, sock, file_size):
+        """
+        Send test data to the proxy with a zero-copy splice loop
+        
+        Falls back to sendfile(2) on platforms without os.splice (e.g. macOS).
+        
+        Args:
+            sock: Connected socket to the proxy
+            file_size: Number of bytes to send
+        """
+        if not hasattr(os, 'splice'):
+            self.send_payload(sock, file_size)
             return
         
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = self.output_dir / f"performance_results_{timestamp}.csv"
+        f = self._payload()
+        f.seek(0)
+        
+        if self._splice_pipe is None:
+            self._splice_pipe = os.pipe()
         
         try:
-            with open(output_file, 'w', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=self.results[0].keys())
-                writer.writeheader()
-                writer.writerows(self.results)
-            
-            logger.info(f"Results saved to {output_file}")
+            _splice_forward(f.fileno(), sock.fileno(), file_size,
+                            sock.gettimeout(), self._splice_pipe)
+        except BaseException:
+            # A failed transfer can leave data in the pipe, so discard it
+            for fd in self._splice_pipe:
+                os.close(fd)
+            self._splice_pipe = None
+            raise
+    
+    def record_result(self, result):
+        """
+        Store a test result and append it to the results CSV
+        
+        Only called from the event loop thread, which also runs the signal
+        handler, so no lock is taken here (one would deadlock on SIGINT).
+        """
+        index = self.results_count
+        if index < len(self.results):
+            self.results[index] = result
+        else:
+            self.results.append(result)
+        self.results_count += 1
+        
+        if self._csv_fh is None:
+            return
+        
+        try:
+            row = [result[field] for field in RESULT_FIELDS]
+            row[TIMESTAMP_COLUMN] = datetime.datetime.fromtimestamp(result['timestamp']).isoformat()
+            self._csv_writer.writerow(row)
+            self._csv_fh.flush()
+        except Exception as e:
+            logger.error(f"Failed to write result: {e}")
+    
+    def save_results(self):
+        """Close the results CSV file"""
+        if self._csv_fh is None:
+            return
+        
+        fh, self._csv_fh = self._csv_fh, None
+        try:
+            fh.close()
+            logger.info(f"Results saved to {self._csv_path}")
         except Exception as e:
             logger.error(f"Failed to save results: {e}")
     
     def analyze_results(self):
         """Analyze and print summary of test results"""
-        if not self.results:
+        if not self.results_count:
             logger.warning("No results to analyze")
             return
         
-        # Group results by test configuration
-        grouped_results = {}
+        # Aggregates for every configured size and mode are allocated up front
+        aggregates = {
+            (float(size_kb), config["proxy"], config["fpga"]): _new_aggregate()
+            for size_kb in self.config['test_settings']['test_data_sizes_kb']
+            for config in TEST_CONFIGS
+        }
         
-        for result in self.results:
+        # Aggregate results by test configuration in a single pass
+        for result in itertools.islice(self.results, self.results_count):
             if not result['success']:
                 continue
-                
+            
             key = (result['file_size_kb'], result['proxy_enabled'], result['fpga_enabled'])
-            if key not in grouped_results:
-                grouped_results[key] = []
+            throughput = result['throughput_kbps']
+            duration = result['duration_sec']
             
-            grouped_results[key].append(result)
+            agg = aggregates.get(key)
+            if agg is None:
+                agg = aggregates[key] = _new_aggregate()
+            agg[AGG_COUNT] += 1
+            agg[AGG_SUM_T] += throughput
+            agg[AGG_SUM_T2] += throughput * throughput
+            if throughput < agg[AGG_MIN_T]:
+                agg[AGG_MIN_T] = throughput
+            if throughput > agg[AGG_MAX_T]:
+                agg[AGG_MAX_T] = throughput
+            agg[AGG_SUM_D] += duration
+            agg[AGG_SUM_D2] += duration * duration
         
         # Print summary
         logger.info("\n===== Test Results Summary =====")
         
-        for key, results in grouped_results.items():
+        for key, agg in aggregates.items():
             file_size_kb, proxy_enabled, fpga_enabled = key
+            count = int(agg[AGG_COUNT])
             
-            throughputs = [r['throughput_kbps'] for r in results]
-            durations = [r['duration_sec'] for r in results]
-            
-            if not throughputs:
+            if not count:
                 continue
-                
-            avg_throughput = statistics.mean(throughputs)
-            avg_duration = statistics.mean(durations)
             
             config_description = (
                 f"File Size: {file_size_kb:.1f} KB, "
@@ -263,16 +769,18 @@ class PerformanceTest:
             )
             
             logger.info(f"\n{config_description}")
-            logger.info(f"Samples: {len(results)}")
-            logger.info(f"Average Throughput: {avg_throughput:.2f} kbps")
-            logger.info(f"Average Duration: {avg_duration:.2f} seconds")
+            logger.info(f"Samples: {count}")
+            logger.info(f"Average Throughput: {agg[AGG_SUM_T] / count:.2f} kbps")
+            logger.info(f"Average Duration: {agg[AGG_SUM_D] / count:.2f} seconds")
             
-            if len(throughputs) > 1:
-                logger.info(f"Throughput Std Dev: {statistics.stdev(throughputs):.2f} kbps")
-                logger.info(f"Duration Std Dev: {statistics.stdev(durations):.2f} seconds")
+            if count > 1:
+                throughput_stdev = _sample_stdev(count, agg[AGG_SUM_T], agg[AGG_SUM_T2])
+                duration_stdev = _sample_stdev(count, agg[AGG_SUM_D], agg[AGG_SUM_D2])
+                logger.info(f"Throughput Std Dev: {throughput_stdev:.2f} kbps")
+                logger.info(f"Duration Std Dev: {duration_stdev:.2f} seconds")
             
-            logger.info(f"Min Throughput: {min(throughputs):.2f} kbps")
-            logger.info(f"Max Throughput: {max(throughputs):.2f} kbps")
+            logger.info(f"Min Throughput: {agg[AGG_MIN_T]:.2f} kbps")
+            logger.info(f"Max Throughput: {agg[AGG_MAX_T]:.2f} kbps")
         
         logger.info("\n================================")
     
@@ -284,8 +792,36 @@ class PerformanceTest:
         self.analyze_results()
         sys.exit(0)
     
+    async def _run_slot(self, executor, next_test, end_time, test_interval_sec):
+        """
+        Keep one connection slot busy until the test duration expires
+        
+        The interval sleep runs concurrently with each transfer, so a new test
+        starts every max(test_interval_sec, transfer time) seconds.
+        
+        Args:
+            executor: Process pool running the transfers
+            next_test: Iterator yielding (size_kb, test configuration) pairs
+            end_time: time.monotonic() value after which no tests are started
+            test_interval_sec: Minimum time between tests on this slot
+        """
+        loop = asyncio.get_running_loop()
+        
+        async def transfer(size_kb, config):
+            result = await loop.run_in_executor(
+                executor, _run_one, size_kb, config, self.next_test_id())
+            self.record_result(result)
+        
+        while time.monotonic() < end_time and self.running:
+            size_kb, config = next(next_test)
+            await asyncio.gather(transfer(size_kb, config), asyncio.sleep(test_interval_sec))
+    
     def run_tests(self):
         """Run all configured performance tests"""
+        asyncio.run(self.run_tests_async())
+    
+    async def run_tests_async(self):
+        """Run all configured performance tests on the current event loop"""
         self.running = True
         
         # Get test configuration
@@ -293,59 +829,67 @@ class PerformanceTest:
         test_data_sizes = self.config['test_settings']['test_data_sizes_kb']
         concurrent_connections = self.config['test_settings']['concurrent_connections']
         test_interval_sec = self.config['test_settings']['test_interval_sec']
+        random_payload = self.config['test_settings'].get('random_payload', False)
+        seed = self.config['test_settings'].get('seed', 0)
         
         logger.info(f"Starting performance tests for {test_duration_sec} seconds")
         logger.info(f"Test data sizes: {test_data_sizes} KB")
         logger.info(f"Concurrent connections: {concurrent_connections}")
         logger.info(f"Test interval: {test_interval_sec} seconds")
         
-        # Prepare test data files
-        test_files = {}
-        for size_kb in test_data_sizes:
-            test_files[size_kb] = self.prepare_test_data(size_kb)
-        
-        # Run tests until time expires
-        start_time = time.time()
-        end_time = start_time + test_duration_sec
+        # Prepare a single test data file large enough for every test size
+        if self._is_rate_limited:
+            logger.info("Link is rate limited, sending zeros instead of test data")
+        else:
+            self.payload_path = self.prepare_test_data(max(test_data_sizes), random_payload)
+            if self.payload_path is None:
+                self.save_results()
+                self.running = False
+                return
         
         try:
-            # Test configurations - we'll test 3 modes:
-            # 1. Direct connection (no proxy)
-            # 2. Proxy without FPGA acceleration
-            # 3. Proxy with FPGA acceleration
-            
-            test_configs = [
-                {"proxy": False, "fpga": False},
-                {"proxy": True, "fpga": False},
-                {"proxy": True, "fpga": True}
-            ]
-            
-            while time.time() < end_time and self.running:
-                # Randomly select test data size
-                size_kb = random.choice(test_data_sizes)
-                data_file = test_files[size_kb]
-                
-                # Randomly select test configuration
-                config = random.choice(test_configs)
-                
-                # Run the test
-                result = self.run_transfer_test(
-                    data_file, 
-                    proxy_enabled=config["proxy"], 
-                    fpga_enabled=config["fpga"]
-                )
-                
-                # Store the result
-                self.results.append(result)
-                
-                # Sleep for the test interval
-                time.sleep(test_interval_sec)
+            # Run tests until time expires
+            start_time = time.monotonic()
+            end_time = start_time + test_duration_sec
+            
+            # Each slot starts at most one test per interval, so the number of
+            # tests is known up front and the results list can be preallocated.
+            # Without an interval there is no bound and the list just grows.
+            if test_interval_sec > 0:
+                tests_per_slot = int(test_duration_sec / test_interval_sec) + 1
+                self.results = [None] * (tests_per_slot * concurrent_connections)
+            else:
+                self.results = []
+            self.results_count = 0
+            
+            # Cycle through every (size, configuration) pair in a shuffled but
+            # reproducible order so each combination is sampled equally often
+            random.seed(seed)
+            schedule = list(itertools.product(test_data_sizes, TEST_CONFIGS))
+            random.shuffle(schedule)
+            next_test = itertools.cycle(schedule)
+            
+            # Keep concurrent_connections transfers in flight
+            executor = ProcessPoolExecutor(max_workers=concurrent_connections,
+                                           initializer=_init_worker,
+                                           initargs=(self.config_path, self.output_dir,
+                                                     self.payload_path, self.link_shaped))
+            try:
+                await asyncio.gather(*(
+                    self._run_slot(executor, next_test, end_time, test_interval_sec)
+                    for _ in range(concurrent_connections)
+                ))
+            except BaseException:
+                # Interrupted (e.g. SIGINT): do not wait for running transfers
+                _terminate_pool(executor)
+                raise
+            executor.shutdown()
         
         finally:
-            # Clean up test data files
-            for file_path in test_files.values():
+            # Clean up the test data file
+            if self.payload_path is not None:
                 try:
-                    os.unlink(file_path)
+                    os.unlink(self.payload_path)
                 except:
                     pass
             
@@ -361,6 +905,8 @@ def main():
                        help='Path to configuration file (default: ../simulation/config.json)')
     parser.add_argument('-o', '--output', default='./results',
                        help='Directory for result files (default: ./results)')
+    parser.add_argument('--link-shaped', action='store_true',
+                       help='The satellite network simulator is shaping the link under test')
     parser.add_argument('-v', '--verbose', action='store_true',
                        help='Enable verbose logging')
     args = parser.parse_args()
@@ -371,7 +917,7 @@ def main():
     
     try:
         # Create and run the performance test
-        tester = PerformanceTest(args.config, args.output)
+        tester = PerformanceTest(args.config, args.output, link_shaped=args.link_shaped)
         tester.run_tests()
     except KeyboardInterrupt:
         logger.info("Interrupted by user")
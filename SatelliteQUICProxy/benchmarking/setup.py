@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+Build script for the optional performance analyzer C helpers
+
+Usage:
+    python setup.py build_ext --inplace
+
+The analyzer falls back to pure-Python transfers if the extension is not built.
+"""
+
+from setuptools import setup, Extension
+
+setup(
+    name='quic-proxy-benchmarking',
+    ext_modules=[Extension('_fast_io', ['_fast_io.c'])],
+)
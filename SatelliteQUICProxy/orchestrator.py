@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Satellite Test Orchestrator
+
+This script runs the satellite network simulator and the QUIC proxy performance
+analyzer in a single process. Both share one asyncio event loop, so netem
+verification, dynamic scenarios and transfer scheduling run on the same
+reactor and a single SIGINT stops the whole run.
+"""
+
+import os
+import sys
+import signal
+import asyncio
+import argparse
+import logging
+
+# The simulator and the analyzer are standalone scripts, not packages
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, 'simulation'))
+sys.path.insert(0, os.path.join(BASE_DIR, 'benchmarking'))
+
+from satellite_network_sim import SatelliteNetworkSimulator
+from performance_analyzer import PerformanceTest
+
+logger = logging.getLogger('orchestrator')
+
+async def run(simulator, tester):
+    """
+    Run the performance tests with the simulator's monitoring on the same loop
+
+    Args:
+        simulator: Simulator whose link conditions have already been applied
+        tester: Performance test to run against the simulated link
+    """
+    # One process owns SIGINT/SIGTERM, replacing the handlers each
+    # component installs for standalone use
+    main_task = asyncio.current_task()
+
+    def shutdown(signum):
+        logger.info(f"Received signal {signum}, shutting down...")
+        tester.running = False
+        simulator.running = False
+        main_task.cancel()
+
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, shutdown, signum)
+
+    simulator.start_tasks()
+    await tester.run_tests_async()
+
+def main():
+    parser = argparse.ArgumentParser(description='Satellite QUIC Proxy Test Orchestrator')
+    parser.add_argument('-c', '--config', default=os.path.join(BASE_DIR, 'simulation', 'config.json'),
+                       help='Path to configuration file (default: simulation/config.json)')
+    parser.add_argument('-o', '--output', default='./results',
+                       help='Directory for result files (default: ./results)')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                       help='Enable verbose logging')
+    args = parser.parse_args()
+
+    # Set log level
+    if args.verbose:
+        for name in ('orchestrator', 'satellite_sim', 'perf_analyzer'):
+            logging.getLogger(name).setLevel(logging.DEBUG)
+
+    # Check if running as root (needed for tc commands)
+    if os.geteuid() != 0:
+        logger.error("This script requires root privileges to modify network settings.")
+        sys.exit(1)
+
+    try:
+        simulator = SatelliteNetworkSimulator(args.config)
+
+        # pyroute2's synchronous API runs its own event loop, so the link is
+        # set up and torn down outside asyncio.run
+        simulator.start_link()
+
+        tester = PerformanceTest(args.config, args.output,
+                                 link_shaped=simulator.tc_applied)
+        asyncio.run(run(simulator, tester))
+    except asyncio.CancelledError:
+        logger.info("Interrupted by user")
+    except Exception as e:
+        logger.error(f"Error in main loop: {e}")
+        if args.verbose:
+            import traceback
+            traceback.print_exc()
+        return 1
+    finally:
+        if 'simulator' in locals():
+            simulator.stop()
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
@@ -12,13 +12,19 @@ import sys
 import time
 import json
 import signal
-import socket
+import asyncio
 import argparse
-import logging
 import subprocess
+import logging
 import threading
+import ctypes
+import ctypes.util
 from datetime import datetime
 
+from pyroute2 import IPRoute, NetlinkError
+from pyroute2.netlink.rtnl import TC_H_ROOT
+from pyroute2.netlink.rtnl.tcmsg.common import percent2u32, time2tick
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -26,6 +32,54 @@ logging.basicConfig(
 )
 logger = logging.getLogger('satellite_sim')
 
+# Handle of the root netem qdisc (1:0)
+NETEM_HANDLE = 0x10000
+
+# Relative difference tolerated when comparing kernel netem values to the
+# configured ones (the kernel rounds delays to scheduler ticks)
+NETEM_TOLERANCE = 0.01
+
+# timerfd flags from <sys/timerfd.h>, for Pythons without os.timerfd_create
+TFD_CLOEXEC = 0o2000000
+TFD_TIMER_ABSTIME = 1
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+class _Itimerspec(ctypes.Structure):
+    _fields_ = [('it_interval', _Timespec), ('it_value', _Timespec)]
+
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    _libc.timerfd_create
+except (OSError, AttributeError):
+    _libc = None
+
+def _timerfd_create():
+    """Return a CLOCK_MONOTONIC timerfd, or None where timerfd is unavailable"""
+    if hasattr(os, 'timerfd_create'):
+        return os.timerfd_create(time.CLOCK_MONOTONIC, flags=os.TFD_CLOEXEC)
+    if _libc is None:
+        return None
+    
+    fd = _libc.timerfd_create(time.CLOCK_MONOTONIC, TFD_CLOEXEC)
+    if fd < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    return fd
+
+def _timerfd_arm(fd, deadline_ns):
+    """Arm a timerfd to expire once at an absolute CLOCK_MONOTONIC time in ns"""
+    if hasattr(os, 'timerfd_settime_ns'):
+        os.timerfd_settime_ns(fd, flags=os.TFD_TIMER_ABSTIME, initial=deadline_ns)
+        return
+    
+    spec = _Itimerspec()
+    spec.it_value.tv_sec, spec.it_value.tv_nsec = divmod(deadline_ns, 1_000_000_000)
+    if _libc.timerfd_settime(fd, TFD_TIMER_ABSTIME, ctypes.byref(spec), None) < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+
 class SatelliteNetworkSimulator:
     """
     Simulates satellite network conditions using Linux traffic control (tc)
@@ -43,6 +97,11 @@ class SatelliteNetworkSimulator:
         self.running = False
         self.tc_applied = False
         self.interface = None
+        self.ifindex = None
+        
+        # Netlink socket used for all traffic control operations
+        self.ipr = IPRoute()
+        self.ipr_lock = threading.RLock()
         
         # Register signal handlers
         signal.signal(signal.SIGINT, self.handle_signal)
@@ -66,18 +125,12 @@ class SatelliteNetworkSimulator:
         if not self.interface:
             # Try to auto-detect the interface
             try:
-                # Create a socket and connect to a public IP to determine outgoing interface
-                with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
-                    s.connect(("8.8.8.8", 80))
-                    ip = s.getsockname()[0]
-                
-                # Find which interface has this IP
-                output = subprocess.check_output(["ip", "-o", "-4", "addr", "show"]).decode('utf-8')
-                for line in output.splitlines():
-                    parts = line.strip().split()
-                    if ip in parts:
-                        self.interface = parts[1]
-                        break
+                # Ask the kernel which interface it would route public traffic through
+                with self.ipr_lock:
+                    route = self.ipr.route('get', dst='8.8.8.8')[0]
+                    self.ifindex = route.get_attr('RTA_OIF')
+                    link = self.ipr.get_links(self.ifindex)[0]
+                self.interface = link.get_attr('IFLA_IFNAME')
             except Exception as e:
                 logger.error(f"Failed to auto-detect network interface: {e}")
                 sys.exit(1)
@@ -86,14 +139,50 @@ class SatelliteNetworkSimulator:
             logger.error("Could not determine network interface to use")
             sys.exit(1)
         
+        # Cache the interface index for netlink requests
+        if self.ifindex is None:
+            with self.ipr_lock:
+                indices = self.ipr.link_lookup(ifname=self.interface)
+            if not indices:
+                logger.error(f"Network interface not found: {self.interface}")
+                sys.exit(1)
+            self.ifindex = indices[0]
+        
         logger.info(f"Using network interface: {self.interface}")
     
+    def netem_command(self, action):
+        """
+        Build the tc command that adds or changes the root netem qdisc
+        
+        The qdisc is configured with tc rather than netlink because pyroute2
+        cannot send the delay distribution table (TCA_NETEM_DELAY_DIST) that
+        'distribution normal' loads.
+        
+        Args:
+            action: tc qdisc action, 'add' or 'change'
+        
+        Returns:
+            list: Command line for subprocess.run
+        """
+        link = self.config['link']
+        cmd = [
+            "tc", "qdisc", action, "dev", self.interface, "root",
+            "handle", f"{NETEM_HANDLE >> 16:x}:", "netem",
+            "delay", f"{link['latency_ms']}ms", f"{link['jitter_ms']}ms"
+        ]
+        
+        # tc rejects a delay distribution without jitter
+        if link['jitter_ms']:
+            cmd += ["distribution", "normal"]
+        
+        cmd += [
+            "loss", f"{link['packet_loss_percent']}%",
+            "rate", f"{link['bandwidth_kbps']}kbit"
+        ]
+        return cmd
+    
     def apply_tc_rules(self):
         """Apply traffic control rules to simulate satellite conditions"""
-        if self.tc_applied:
-            logger.warning("Traffic control rules already applied. Removing and reapplying...")
-            self.remove_tc_rules()
-        
         try:
             # Get satellite link parameters
             latency = self.config['link']['latency_ms']
@@ -101,27 +190,38 @@ class SatelliteNetworkSimulator:
             packet_loss = self.config['link']['packet_loss_percent']
             bandwidth = self.config['link']['bandwidth_kbps']
             
-            # Clear any existing rules
-            subprocess.run(["tc", "qdisc", "del", "dev", self.interface, "root"], 
-                          stderr=subprocess.DEVNULL)
-            
-            # Add qdisc with satellite link characteristics
-            cmd = [
-                "tc", "qdisc", "add", "dev", self.interface, "root", "netem",
-                "delay", f"{latency}ms", f"{jitter}ms", "distribution", "normal",
-                "loss", f"{packet_loss}%",
-                "rate", f"{bandwidth}kbit"
-            ]
-            
-            logger.info(f"Applying traffic control: {' '.join(cmd)}")
-            subprocess.run(cmd, check=True)
+            with self.ipr_lock:
+                changed = False
+                
+                if self.tc_applied:
+                    # Update the existing qdisc in place so traffic is never
+                    # left without a qdisc between a delete and an add
+                    try:
+                        subprocess.run(self.netem_command('change'), check=True,
+                                       stderr=subprocess.PIPE, text=True)
+                        changed = True
+                    except subprocess.CalledProcessError as e:
+                        logger.warning(f"Failed to change traffic control rules "
+                                       f"({e.stderr.strip()}). Removing and reapplying...")
+                
+                if not changed:
+                    # Clear any existing rules
+                    try:
+                        self.ipr.tc('del', index=self.ifindex, parent=TC_H_ROOT)
+                    except NetlinkError:
+                        pass
+                    
+                    # Add qdisc with satellite link characteristics
+                    cmd = self.netem_command('add')
+                    logger.info(f"Applying traffic control: {' '.join(cmd)}")
+                    subprocess.run(cmd, check=True)
             
             self.tc_applied = True
             logger.info(f"Applied satellite network conditions: "
                       f"Latency={latency}ms, Jitter={jitter}ms, "
                       f"Loss={packet_loss}%, Bandwidth={bandwidth}kbps")
             
-        except subprocess.CalledProcessError as e:
+        except (NetlinkError, subprocess.CalledProcessError) as e:
             logger.error(f"Failed to apply traffic control rules: {e}")
             sys.exit(1)
     
@@ -132,22 +232,28 @@ class SatelliteNetworkSimulator:
         
         try:
             # Clear the rules
-            subprocess.run(["tc", "qdisc", "del", "dev", self.interface, "root"], check=True)
+            with self.ipr_lock:
+                self.ipr.tc('del', index=self.ifindex, parent=TC_H_ROOT)
             logger.info("Removed traffic control rules")
             self.tc_applied = False
-        except subprocess.CalledProcessError as e:
+        except NetlinkError as e:
             logger.error(f"Failed to remove traffic control rules: {e}")
     
+    def check_link_status(self):
+        """Log traffic control statistics and check the link conditions once"""
+        # Get updated network statistics
+        with self.ipr_lock:
+            qdiscs = self.ipr.get_qdiscs(index=self.ifindex)
+        logger.debug(f"Current traffic control statistics:\n{qdiscs}")
+        
+        # Verify link conditions still match configured values
+        self.verify_link_conditions()
+    
     def status_monitoring_thread(self):
         """Background thread to periodically update status and check link conditions"""
         while self.running:
             try:
-                # Get updated network statistics
-                output = subprocess.check_output(["tc", "-s", "qdisc", "show", "dev", self.interface])
-                logger.debug(f"Current traffic control statistics:\n{output.decode('utf-8')}")
-                
-                # Verify link conditions still match configured values
-                self.verify_link_conditions()
+                self.check_link_status()
                 
                 # Sleep for status update interval
                 time.sleep(self.config.get('status_interval_sec', 30))
@@ -155,21 +261,75 @@ class SatelliteNetworkSimulator:
                 logger.error(f"Error in status monitoring: {e}")
                 time.sleep(5)  # Sleep briefly on error
     
+    async def status_monitoring_task(self):
+        """Asyncio counterpart of status_monitoring_thread"""
+        while self.running:
+            try:
+                await asyncio.to_thread(self.check_link_status)
+                
+                # Sleep for status update interval
+                await asyncio.sleep(self.config.get('status_interval_sec', 30))
+            except Exception as e:
+                logger.error(f"Error in status monitoring: {e}")
+                await asyncio.sleep(5)  # Sleep briefly on error
+    
+    def get_netem_qdisc(self):
+        """Return the root netem qdisc on the interface, or None if missing"""
+        with self.ipr_lock:
+            qdiscs = self.ipr.get_qdiscs(index=self.ifindex)
+        
+        for qdisc in qdiscs:
+            if qdisc['parent'] == TC_H_ROOT and qdisc.get_attr('TCA_KIND') == 'netem':
+                return qdisc
+        return None
+    
+    def netem_mismatches(self, qdisc):
+        """
+        Compare a netem qdisc against the configured link parameters
+        
+        Args:
+            qdisc: Netem qdisc message returned by get_netem_qdisc
+        
+        Returns:
+            list: Names of the parameters that differ from the configuration
+        """
+        link = self.config['link']
+        options = qdisc.get_attr('TCA_OPTIONS')
+        rate = options.get_attr('TCA_NETEM_RATE')
+        
+        values = {
+            'delay': (options['delay'], time2tick(link['latency_ms'] * 1000)),
+            'jitter': (options['jitter'], time2tick(link['jitter_ms'] * 1000)),
+            'loss': (options['loss'], percent2u32(link['packet_loss_percent'])),
+            # netem reports the rate in bytes per second
+            'rate': (rate['rate'] if rate else 0, link['bandwidth_kbps'] * 1000 // 8)
+        }
+        
+        return [
+            name for name, (actual, wanted) in values.items()
+            if abs(actual - wanted) > max(1, wanted * NETEM_TOLERANCE)
+        ]
+    
     def verify_link_conditions(self):
         """Verify that the current link conditions match the configured values"""
         try:
-            # This is a simplified check - a real implementation would verify all parameters
-            output = subprocess.check_output(["tc", "qdisc", "show", "dev", self.interface])
+            qdisc = self.get_netem_qdisc()
             
-            # Just check if any TC rules exist
-            if b"netem" not in output:
+            if qdisc is None:
                 logger.warning("Traffic control rules appear to be missing. Reapplying...")
                 self.apply_tc_rules()
+                return
+            
+            mismatches = self.netem_mismatches(qdisc)
+            if mismatches:
+                logger.warning(f"Traffic control parameters differ from configuration "
+                               f"({', '.join(mismatches)}). Reapplying...")
+                self.apply_tc_rules()
         except Exception as e:
             logger.error(f"Error verifying link conditions: {e}")
     
-    def start(self):
-        """Start the satellite network simulator"""
+    def start_link(self):
+        """Detect the interface and apply the configured link conditions"""
         logger.info("Starting satellite network simulator")
         self.running = True
         
@@ -178,6 +338,30 @@ class SatelliteNetworkSimulator:
         
         # Apply traffic control rules
         self.apply_tc_rules()
+    
+    def pin_process(self):
+        """Pin the process to the configured sim_cpu and raise its priority"""
+        sim_cpu = self.config.get('sim_cpu')
+        if sim_cpu is None:
+            return
+        
+        try:
+            os.sched_setaffinity(0, {int(sim_cpu)})
+            logger.info(f"Pinned simulator to CPU {sim_cpu}")
+        except (AttributeError, OSError) as e:
+            logger.warning(f"Failed to pin simulator to CPU {sim_cpu}: {e}")
+        
+        try:
+            os.nice(-10)
+        except OSError as e:
+            logger.warning(f"Failed to raise simulator priority: {e}")
+    
+    def start(self):
+        """Start the satellite network simulator"""
+        # Only the standalone simulator is pinned; in the orchestrator the
+        # analyzer's forked workers would inherit the single-CPU affinity
+        self.pin_process()
+        self.start_link()
         
         # Start monitoring thread
         self.monitor_thread = threading.Thread(target=self.status_monitoring_thread)
@@ -197,6 +381,39 @@ class SatelliteNetworkSimulator:
         self.dynamic_thread.start()
         logger.info("Dynamic condition simulation enabled")
     
+    def start_tasks(self):
+        """
+        Run monitoring and dynamic conditions as tasks on the running event loop
+        
+        start_link() must be called before the event loop starts. pyroute2's
+        synchronous API runs its own event loop and cannot be used from inside
+        another one, so the tasks hand every netlink call to a worker thread.
+        """
+        self.tasks = [asyncio.create_task(self.status_monitoring_task())]
+        logger.info("Satellite network simulator started successfully")
+        
+        if self.config.get('enable_dynamic_conditions', False):
+            self.tasks.append(asyncio.create_task(self.dynamic_conditions_task()))
+            logger.info("Dynamic condition simulation enabled")
+    
+    def apply_scenario(self, scenario):
+        """
+        Switch the link to the conditions of a dynamic scenario
+        
+        Args:
+            scenario: Entry of the dynamic_scenarios configuration list
+        """
+        logger.info(f"Applying dynamic scenario: {scenario['name']}")
+        
+        # Update config with this scenario's settings
+        self.config['link']['latency_ms'] = scenario['latency_ms']
+        self.config['link']['jitter_ms'] = scenario['jitter_ms']
+        self.config['link']['packet_loss_percent'] = scenario['packet_loss_percent']
+        self.config['link']['bandwidth_kbps'] = scenario['bandwidth_kbps']
+        
+        # Apply the new settings
+        self.apply_tc_rules()
+    
     def dynamic_conditions_thread(self):
         """Thread to periodically change network conditions"""
         scenarios = self.config.get('dynamic_scenarios', [])
@@ -204,28 +421,63 @@ class SatelliteNetworkSimulator:
             logger.warning("Dynamic conditions enabled but no scenarios defined")
             return
         
+        # Scenario boundaries are absolute deadlines, so time spent applying
+        # the rules does not push later transitions back
+        try:
+            timer = _timerfd_create()
+        except OSError as e:
+            logger.warning(f"Failed to create scenario timer, using sleep: {e}")
+            timer = None
+        deadline = time.monotonic_ns()
+        
+        try:
+            while self.running:
+                for scenario in scenarios:
+                    if not self.running:
+                        break
+                    
+                    self.apply_scenario(scenario)
+                    
+                    # Wait for the scenario duration
+                    deadline += int(scenario['duration_sec'] * 1e9)
+                    if timer is None:
+                        time.sleep(max(deadline - time.monotonic_ns(), 0) / 1e9)
+                    else:
+                        _timerfd_arm(timer, deadline)
+                        os.read(timer, 8)
+        finally:
+            if timer is not None:
+                os.close(timer)
+    
+    async def dynamic_conditions_task(self):
+        """Asyncio counterpart of dynamic_conditions_thread"""
+        scenarios = self.config.get('dynamic_scenarios', [])
+        if not scenarios:
+            logger.warning("Dynamic conditions enabled but no scenarios defined")
+            return
+        
+        # Scenario boundaries are absolute deadlines on the loop's clock, as
+        # in dynamic_conditions_thread
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        
         while self.running:
             for scenario in scenarios:
                 if not self.running:
                     break
                 
-                # Apply this scenario
-                logger.info(f"Applying dynamic scenario: {scenario['name']}")
-                
-                # Update config with this scenario's settings
-                self.config['link']['latency_ms'] = scenario['latency_ms']
-                self.config['link']['jitter_ms'] = scenario['jitter_ms']
-                self.config['link']['packet_loss_percent'] = scenario['packet_loss_percent']
-                self.config['link']['bandwidth_kbps'] = scenario['bandwidth_kbps']
-                
-                # Apply the new settings
-                self.apply_tc_rules()
+                await asyncio.to_thread(self.apply_scenario, scenario)
                 
                 # Wait for the scenario duration
-                time.sleep(scenario['duration_sec'])
+                deadline += scenario['duration_sec']
+                await asyncio.sleep(max(deadline - loop.time(), 0))
     
     def stop(self):
-        """Stop the satellite network simulator"""
+        """
+        Stop the satellite network simulator
+        
+        Must not be called from inside a running event loop (see start_tasks).
+        """
         logger.info("Stopping satellite network simulator")
         self.running = False
         
@@ -240,6 +492,9 @@ class SatelliteNetworkSimulator:
         if hasattr(self, 'dynamic_thread') and self.dynamic_thread.is_alive():
             self.dynamic_thread.join(timeout=2)
         
+        with self.ipr_lock:
+            self.ipr.close()
+        
         logger.info("Satellite network simulator stopped")
     
     def handle_signal(self, signum, frame):